@@ -0,0 +1,443 @@
+"""Нагрузочный бенчмарк страниц Yatube.
+
+Заполняет тестовую базу реалистичным набором данных и измеряет время
+ответа (p50/p99), количество запросов к базе и пиковое выделение памяти
+для основных адресов проекта, а также стоимость отрисовки одной карточки
+поста в шаблонах со списками. Результат выводится в формате JSON, чтобы
+его можно было сравнить с замером на другом коммите.
+
+Запуск из корня репозитория:
+
+    python -m tests.benchmark --output bench.json
+    python -m tests.benchmark --compare bench.json
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_DIR_NAME = 'yatube'
+MANAGE_PATH = os.path.join(BASE_DIR, PROJECT_DIR_NAME)
+LIST_TEMPLATES = (
+    ('index', ('posts/index.html', 'index.html')),
+    ('group_list', ('posts/group_list.html', 'group_list.html')),
+    ('profile', ('posts/profile.html', 'profile.html')),
+    ('follow_index', ('posts/follow.html', 'follow.html')),
+)
+
+
+def setup_django():
+    sys.path.insert(0, MANAGE_PATH)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    import django
+    django.setup()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Бенчмарк страниц Yatube')
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--groups', type=int, default=100)
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--comments', type=int, default=1000000)
+    parser.add_argument('--max-follows', type=int, default=500,
+                        help='максимум подписок у одного пользователя')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--requests', type=int, default=200,
+                        help='число замеров на каждый адрес')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--cold-cache', action='store_true',
+                        help='очищать кэш перед каждым запросом')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='файл для результата в JSON')
+    parser.add_argument('--compare', help='JSON предыдущего замера для сравнения')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='допустимый рост p99 относительно предыдущего замера')
+    return parser.parse_args()
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def zipf_cum_weights(count, exponent=1.1):
+    """Накопленные веса распределения Ципфа: немногие авторы популярны."""
+    total = 0.0
+    cum_weights = []
+    for rank in range(1, count + 1):
+        total += 1.0 / rank ** exponent
+        cum_weights.append(total)
+    return cum_weights
+
+
+def bulk_insert(model, objects, batch_size):
+    created = 0
+    for batch in batched(objects, batch_size):
+        model.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def id_range(model):
+    from django.db.models import Max, Min
+    bounds = model.objects.aggregate(low=Min('id'), high=Max('id'))
+    return bounds['low'], bounds['high']
+
+
+def seed(args, rnd):
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from django.db import transaction
+    from posts.models import Comment, Follow, Group, Post
+
+    User = get_user_model()
+    password = make_password('bench-password')
+    started = time.perf_counter()
+
+    with transaction.atomic():
+        bulk_insert(User, (
+            User(username=f'bench_user_{i}', password=password)
+            for i in range(args.users)
+        ), args.batch_size)
+        bulk_insert(Group, (
+            Group(title=f'Группа {i}', slug=f'bench-group-{i}', description=f'Описание группы {i}')
+            for i in range(args.groups)
+        ), args.batch_size)
+
+    user_low, _ = id_range(User)
+    group_low, _ = id_range(Group)
+    user_ids = range(user_low, user_low + args.users)
+    cum_weights = zipf_cum_weights(args.users)
+
+    def follows():
+        for user_id in user_ids:
+            count = min(int(rnd.paretovariate(1.2)), args.max_follows, args.users - 1)
+            authors = set(rnd.choices(user_ids, cum_weights=cum_weights, k=count))
+            authors.discard(user_id)
+            for author_id in authors:
+                yield Follow(user_id=user_id, author_id=author_id)
+
+    def posts():
+        for i in range(args.posts):
+            group_id = group_low + rnd.randrange(args.groups) if rnd.random() < 0.7 else None
+            yield Post(
+                text=f'Тестовый пост {i}',
+                author_id=rnd.choices(user_ids, cum_weights=cum_weights)[0],
+                group_id=group_id,
+            )
+
+    with transaction.atomic():
+        follows_count = bulk_insert(Follow, follows(), args.batch_size)
+    with transaction.atomic():
+        bulk_insert(Post, posts(), args.batch_size)
+
+    post_low, _ = id_range(Post)
+    post_weights = zipf_cum_weights(args.posts)
+    post_ids = range(post_low, post_low + args.posts)
+
+    def comments():
+        for i in range(args.comments):
+            yield Comment(
+                text=f'Тестовый комментарий {i}',
+                post_id=rnd.choices(post_ids, cum_weights=post_weights)[0],
+                author_id=rnd.choice(user_ids),
+            )
+
+    with transaction.atomic():
+        bulk_insert(Comment, comments(), args.batch_size)
+
+    return {
+        'users': args.users,
+        'groups': args.groups,
+        'posts': args.posts,
+        'comments': args.comments,
+        'follows': follows_count,
+        'seed_seconds': round(time.perf_counter() - started, 2),
+    }
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = max(0, int(round(percent / 100 * len(ordered))) - 1)
+    return ordered[index]
+
+
+def build_endpoints():
+    from django.contrib.auth import get_user_model
+    from django.db.models import Count
+    from posts.models import Follow, Group, Post
+
+    User = get_user_model()
+    top_author = Post.objects.values('author').annotate(total=Count('id')).order_by('-total').first()
+    top_reader = Follow.objects.values('user').annotate(total=Count('id')).order_by('-total').first()
+    author = User.objects.get(id=top_author['author'])
+    reader = User.objects.get(id=top_reader['user'])
+    group = Group.objects.order_by('id').first()
+    post = Post.objects.filter(author=author).order_by('id').first()
+    return reader, author, group, [
+        ('index', 'get', '/', None),
+        ('group_list', 'get', f'/group/{group.slug}/', None),
+        ('profile', 'get', f'/profile/{author.username}/', None),
+        ('post_detail', 'get', f'/posts/{post.id}/', None),
+        ('follow_index', 'get', '/follow/', None),
+        ('post_create', 'post', '/create/', {'text': 'Пост из бенчмарка', 'group': group.id}),
+        ('add_comment', 'post', f'/posts/{post.id}/comment/', {'text': 'Комментарий из бенчмарка'}),
+    ]
+
+
+def measure(client, method, url, data, args):
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    request = getattr(client, method)
+    expected_status = 302 if method == 'post' else 200
+    for _ in range(args.warmup):
+        request(url, data)
+
+    timings = []
+    for _ in range(args.requests):
+        if args.cold_cache:
+            cache.clear()
+        started = time.perf_counter()
+        response = request(url, data)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == expected_status, (
+            f'Страница `{url}` вернула код {response.status_code} вместо {expected_status}'
+        )
+
+    # Запросы считаются отдельно: CaptureQueriesContext включает отладочный курсор.
+    queries = []
+    for _ in range(min(args.requests, 20)):
+        if args.cold_cache:
+            cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            request(url, data)
+        queries.append(len(context))
+
+    peaks = []
+    tracemalloc.start()
+    for _ in range(min(args.requests, 20)):
+        if args.cold_cache:
+            cache.clear()
+        tracemalloc.clear_traces()
+        request(url, data)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+
+    return {
+        'url': url,
+        'method': method.upper(),
+        'requests': args.requests,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'queries_p50': percentile(queries, 50),
+        'queries_max': max(queries),
+        'alloc_peak_kb': round(percentile(peaks, 50) / 1024, 1),
+    }
+
+
+def attach_images(posts):
+    """Прикрепляет к постам настоящие JPEG, чтобы в замер попали теги миниатюр."""
+    from django.core.files.base import ContentFile
+    from PIL import Image
+
+    for post in posts:
+        file_obj = BytesIO()
+        Image.new('RGB', size=(1600, 1200), color=(post.id % 256, 128, 64)).save(file_obj, 'jpeg')
+        post.image.save(f'bench_{post.id}.jpg', ContentFile(file_obj.getvalue()), save=True)
+
+
+def measure_templates(reader, author, group, args):
+    """Время отрисовки шаблона на одну карточку поста.
+
+    Запросы к базе во время отрисовки считаются отдельно: если они есть,
+    время карточки зависит от базы и не сравнивается между замерами.
+    Фрагменты `{% cache %}` пишутся в отдельный кэш, который очищается
+    перед каждой отрисовкой вне замера времени.
+    """
+    from django.conf import settings
+    from django.core.cache import caches
+    from django.test import override_settings
+
+    fragment_caches = dict(settings.CACHES, template_fragments={
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark-template-fragments',
+    })
+    with override_settings(CACHES=fragment_caches):
+        return render_templates(reader, author, group, args, caches['template_fragments'])
+
+
+def render_templates(reader, author, group, args, fragment_cache):
+    from django.core.paginator import Paginator
+    from django.db import connection
+    from django.template import TemplateDoesNotExist
+    from django.template.loader import select_template
+    from django.test import RequestFactory
+    from django.test.utils import CaptureQueriesContext
+    from posts.models import Post
+
+    request = RequestFactory().get('/')
+    request.user = reader
+    posts = list(Post.objects.filter(author=author).select_related('author', 'group').order_by('-id')[:10])
+    attach_images(posts)
+    contexts = {
+        cards: {'page_obj': Paginator(posts[:cards], 10).page(1), 'author': author, 'group': group}
+        for cards in (1, len(posts))
+    }
+
+    def render(template, cards):
+        fragment_cache.clear()
+        return template.render(contexts[cards], request)
+
+    results = {}
+    for name, names in LIST_TEMPLATES:
+        try:
+            template = select_template(names)
+        except TemplateDoesNotExist:
+            continue
+        template_name = template.template.origin.template_name
+        if render(template, 1) == render(template, len(posts)):
+            print(f'{name}: вывод `{template_name}` не зависит от числа карточек, шаблон пропущен',
+                  file=sys.stderr)
+            results[name] = {'template': template_name, 'skipped': True}
+            continue
+        timings = {}
+        for cards in contexts:
+            for _ in range(args.warmup):
+                render(template, cards)
+            samples = []
+            for _ in range(args.requests):
+                fragment_cache.clear()
+                started = time.perf_counter()
+                template.render(contexts[cards], request)
+                samples.append((time.perf_counter() - started) * 1000)
+            timings[cards] = percentile(samples, 50)
+        fragment_cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            template.render(contexts[len(posts)], request)
+        results[name] = {
+            'template': template_name,
+            'cards': len(posts),
+            'queries': len(captured),
+            'page_ms': round(timings[len(posts)], 3),
+            'per_card_ms': round((timings[len(posts)] - timings[1]) / max(len(posts) - 1, 1), 3),
+        }
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=BASE_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(result, previous_path, threshold):
+    with open(previous_path, encoding='utf-8') as file:
+        previous = json.load(file)
+    regressions = []
+    for name, current in result['templates'].items():
+        before = previous.get('templates', {}).get(name)
+        if before is None or 'per_card_ms' not in before or 'per_card_ms' not in current:
+            continue
+        ratio = current['per_card_ms'] / before['per_card_ms'] if before['per_card_ms'] > 0 else 1.0
+        before_queries = before.get('queries', 0)
+        print(
+            f'{name:<14} карточка {before["per_card_ms"]:>7.3f} -> {current["per_card_ms"]:>7.3f} ms '
+            f'(x{ratio:.2f}), запросов {before_queries} -> {current["queries"]}',
+            file=sys.stderr,
+        )
+        if current['queries'] > before_queries:
+            regressions.append(f'{name} (запросы в шаблоне)')
+        elif current['queries'] == 0 and ratio > threshold:
+            regressions.append(f'{name} (шаблон)')
+    for name, current in result['endpoints'].items():
+        before = previous.get('endpoints', {}).get(name)
+        if before is None:
+            continue
+        ratio = current['p99_ms'] / before['p99_ms'] if before['p99_ms'] else 1.0
+        print(
+            f'{name:<14} p99 {before["p99_ms"]:>9.2f} -> {current["p99_ms"]:>9.2f} ms '
+            f'(x{ratio:.2f}), запросов {before["queries_max"]} -> {current["queries_max"]}',
+            file=sys.stderr,
+        )
+        if ratio > threshold or current['queries_max'] > before['queries_max']:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    args = parse_args()
+    setup_django()
+
+    from django.test import Client, override_settings
+    from django.test.utils import (
+        setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+    )
+
+    setup_test_environment(debug=False)
+    old_config = setup_databases(verbosity=0, interactive=False)
+    media_root = tempfile.TemporaryDirectory()
+    media_settings = override_settings(MEDIA_ROOT=media_root.name)
+    media_settings.enable()
+    try:
+        rnd = random.Random(args.seed)
+        dataset = seed(args, rnd)
+        reader, author, group, endpoints = build_endpoints()
+        anonymous = Client()
+        authorized = Client()
+        authorized.force_login(reader)
+
+        results = {}
+        for name, method, url, data in endpoints:
+            client = anonymous if method == 'get' and name != 'follow_index' else authorized
+            results[name] = measure(client, method, url, data, args)
+        # После адресов: attach_images меняет посты автора, чьи страницы измеряются выше.
+        templates = measure_templates(reader, author, group, args)
+    finally:
+        media_settings.disable()
+        media_root.cleanup()
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+
+    result = {
+        'revision': git_revision(),
+        'python': sys.version.split()[0],
+        'cold_cache': args.cold_cache,
+        'dataset': dataset,
+        'endpoints': results,
+        'templates': templates,
+    }
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        regressions = compare(result, args.compare, args.threshold)
+        if regressions:
+            print(f'Регрессия производительности: {", ".join(regressions)}', file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
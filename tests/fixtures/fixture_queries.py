@@ -0,0 +1,178 @@
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import pytest
+from django.core.signals import request_finished, request_started
+from django.db import connection
+from django.template.base import Node
+from django.urls import Resolver404, resolve
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+MANAGE_PATH = os.path.join(BASE_DIR, 'yatube')
+
+FINDINGS = []
+
+WHITESPACE = re.compile(r'\s+')
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+
+
+def fingerprint(sql):
+    """Приводит SQL к виду без параметров, чтобы сравнивать одинаковые запросы."""
+    sql = LITERALS.sub('?', sql.replace('%s', '?'))
+    sql = PLACEHOLDER_LIST.sub('(?+)', sql)
+    return WHITESPACE.sub(' ', sql).strip()
+
+
+def find_origin():
+    """Возвращает строку проекта и шаблона, откуда выполнен запрос."""
+    view_line = template_line = None
+    frame = sys._getframe(2)
+    while frame is not None and not (view_line and template_line):
+        filename = frame.f_code.co_filename
+        if view_line is None and filename.startswith(MANAGE_PATH) and 'site-packages' not in filename:
+            view_line = f'{os.path.relpath(filename, MANAGE_PATH)}:{frame.f_lineno} ({frame.f_code.co_name})'
+        node = frame.f_locals.get('self')
+        if template_line is None and frame.f_code.co_name == 'render_annotated' and isinstance(node, Node):
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                template_line = f'{origin.template_name}:{token.lineno}'
+        frame = frame.f_back
+    return ', '.join(line for line in (view_line, template_line) if line) or 'неизвестно'
+
+
+class QueryRecorder:
+    """Собирает запросы по отпечаткам.
+
+    `ignore` — имена таблиц или регулярные выражения: подходящие запросы
+    (например, к `thumbnail_kvstore` у sorl-thumbnail) не учитываются.
+    """
+
+    def __init__(self, max_repeats=1, slow_ms=None, ignore=()):
+        self.max_repeats = max_repeats
+        self.slow_ms = slow_ms
+        self.ignore = [re.compile(pattern) for pattern in ignore]
+        self.queries = defaultdict(list)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - started) * 1000
+            sql = fingerprint(sql)
+            if not any(pattern.search(sql) for pattern in self.ignore):
+                self.queries[sql].append((duration, find_origin()))
+
+    def duplicates(self):
+        return {
+            sql: calls for sql, calls in self.queries.items()
+            if len(calls) > self.max_repeats
+        }
+
+    def slow(self):
+        if self.slow_ms is None:
+            return {}
+        return {
+            sql: [call for call in calls if call[0] > self.slow_ms]
+            for sql, calls in self.queries.items()
+            if any(call[0] > self.slow_ms for call in calls)
+        }
+
+    def report(self):
+        lines = []
+        for sql, calls in self.duplicates().items():
+            origins = sorted({origin for _, origin in calls})
+            lines.append(f'Запрос выполнен {len(calls)} раз(а) из {"; ".join(origins)}: {sql}')
+        for sql, calls in self.slow().items():
+            duration, origin = max(calls)
+            lines.append(f'Медленный запрос {duration:.1f} мс из {origin}: {sql}')
+        return '\n'.join(lines)
+
+
+class RequestQueryDetector:
+    """Записывает запросы к базе отдельно для каждого запроса тестового клиента."""
+
+    def __init__(self, nodeid, max_repeats, slow_ms):
+        self.nodeid = nodeid
+        self.max_repeats = max_repeats
+        self.slow_ms = slow_ms
+        self.recorder = None
+        self.target = ''
+
+    def started(self, sender, environ=None, **kwargs):
+        environ = environ or {}
+        path = environ.get('PATH_INFO', '')
+        try:
+            view_name = resolve(path).view_name
+        except Resolver404:
+            view_name = 'не найден'
+        self.target = f'{environ.get("REQUEST_METHOD", "")} {path} ({view_name})'
+        self.recorder = QueryRecorder(self.max_repeats, self.slow_ms)
+        connection.execute_wrappers.append(self.recorder)
+
+    def finished(self, sender=None, **kwargs):
+        if self.recorder is None:
+            return
+        connection.execute_wrappers.remove(self.recorder)
+        report = self.recorder.report()
+        self.recorder = None
+        if report:
+            FINDINGS.append(f'{self.nodeid}: {self.target}\n{report}')
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('queries')
+    group.addoption(
+        '--duplicate-queries', type=int, default=0, metavar='N',
+        help='сообщать о SQL-запросах, повторённых за один запрос к странице больше N раз; '
+             'находки выводятся в итоговой сводке pytest и не роняют тесты',
+    )
+    group.addoption(
+        '--slow-query-ms', type=float, default=None, metavar='MS',
+        help='сообщать о SQL-запросах медленнее MS миллисекунд в итоговой сводке pytest',
+    )
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not FINDINGS:
+        return
+    terminalreporter.section('Повторяющиеся и медленные SQL-запросы')
+    for finding in FINDINGS:
+        terminalreporter.write_line(finding)
+
+
+@pytest.fixture
+def duplicate_queries():
+    """Проверяет, что внутри блока нет повторяющихся и медленных запросов."""
+    @contextmanager
+    def check(max_repeats=1, slow_ms=None, ignore=()):
+        recorder = QueryRecorder(max_repeats, slow_ms, ignore)
+        with connection.execute_wrapper(recorder):
+            yield recorder
+        report = recorder.report()
+        assert not report, f'Найдены лишние запросы к базе:\n{report}'
+    return check
+
+
+@pytest.fixture(autouse=True)
+def _detect_duplicate_queries(request):
+    max_repeats = request.config.getoption('--duplicate-queries')
+    slow_ms = request.config.getoption('--slow-query-ms')
+    if not (max_repeats or slow_ms) or request.node.get_closest_marker('django_db') is None:
+        yield
+        return
+    detector = RequestQueryDetector(request.node.nodeid, max_repeats or sys.maxsize, slow_ms)
+    request_started.connect(detector.started)
+    request_finished.connect(detector.finished)
+    try:
+        yield
+    finally:
+        request_started.disconnect(detector.started)
+        request_finished.disconnect(detector.finished)
+        detector.finished()
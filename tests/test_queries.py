@@ -0,0 +1,113 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+try:
+    from posts.models import Post
+except ImportError:
+    assert False, 'Не найдена модель Post'
+
+try:
+    from posts.models import Comment
+except ImportError:
+    assert False, 'Не найдена модель Comment'
+
+THUMBNAIL_TABLES = ('thumbnail_kvstore',)
+
+
+def get_queries_count(client, url, url_templ):
+    cache.clear()
+    with CaptureQueriesContext(connection) as context:
+        try:
+            response = client.get(url)
+        except Exception as e:
+            assert False, f'''Страница `{url_templ}` работает неправильно. Ошибка: `{e}`'''
+    assert response.status_code == 200, (
+        f'Страница `{url_templ}` не найдена, проверьте этот адрес в *urls.py*'
+    )
+    return len(context)
+
+
+def blend_posts(mixer, count, **kwargs):
+    # Без явного значения mixer прикрепляет к каждому посту картинку,
+    # и запросы sorl-thumbnail к `thumbnail_kvstore` растут вместе с числом карточек.
+    kwargs.setdefault('image', '')
+    posts = mixer.cycle(count).blend(Post, **kwargs)
+    for post in posts:
+        mixer.cycle(3).blend(Comment, post=post, author=post.author)
+    return posts
+
+
+class TestPostQuerySet:
+
+    def test_post_manager_for_listing(self):
+        assert hasattr(Post.objects, 'for_listing'), (
+            'Добавьте в менеджер модели `Post` метод `for_listing()`, '
+            'который подготавливает запрос для страниц со списком постов'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_for_listing_without_extra_queries(self, mock_media, mixer, user, group):
+        blend_posts(mixer, 5, author=user, group=group)
+        posts = list(Post.objects.for_listing())
+        assert all(hasattr(post, 'comment_count') for post in posts), (
+            'Проверьте, что `Post.objects.for_listing()` добавляет к постам число комментариев '
+            '`comment_count` через `annotate`'
+        )
+        with CaptureQueriesContext(connection) as context:
+            comment_counts = []
+            for post in posts:
+                str(post.author)
+                str(post.group)
+                comment_counts.append(post.comment_count)
+        assert len(context) == 0, (
+            'Проверьте, что `Post.objects.for_listing()` сразу подгружает автора, группу поста '
+            'и число комментариев через `select_related` и `annotate`'
+        )
+        assert comment_counts == [3] * len(posts), (
+            'Проверьте, что `comment_count` в `Post.objects.for_listing()` считает комментарии поста'
+        )
+
+
+class TestListQueries:
+
+    def check_page_queries(self, client, mixer, duplicate_queries, url, url_templ, **kwargs):
+        blend_posts(mixer, 1, **kwargs)
+        single_post_queries = get_queries_count(client, url, url_templ)
+        blend_posts(mixer, 19, **kwargs)
+        full_page_queries = get_queries_count(client, url, url_templ)
+        assert full_page_queries <= single_post_queries, (
+            f'Проверьте, что количество запросов к базе на странице `{url_templ}` '
+            f'не зависит от числа постов: с одним постом {single_post_queries}, '
+            f'с полной страницей {full_page_queries}'
+        )
+        # Миниатюры уже созданы запросами выше, поэтому строгая проверка идёт
+        # на прогретом хранилище sorl-thumbnail; его запросы по карточкам не считаются.
+        cache.clear()
+        with duplicate_queries(ignore=THUMBNAIL_TABLES):
+            client.get(url)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_index_queries(self, mock_media, client, mixer, duplicate_queries, user, group):
+        self.check_page_queries(client, mixer, duplicate_queries, '/', '/', author=user, group=group)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_group_queries(self, mock_media, client, mixer, duplicate_queries, user, group):
+        self.check_page_queries(
+            client, mixer, duplicate_queries, f'/group/{group.slug}/', '/group/<slug>/', author=user, group=group
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_profile_queries(self, mock_media, user_client, mixer, duplicate_queries, user, group):
+        self.check_page_queries(
+            user_client, mixer, duplicate_queries, f'/profile/{user.username}/', '/profile/<username>/',
+            author=user, group=group,
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow_index_queries(self, mock_media, user_client, mixer, duplicate_queries, user, another_user, group):
+        mixer.blend('posts.Follow', user=user, author=another_user)
+        self.check_page_queries(
+            user_client, mixer, duplicate_queries, '/follow/', '/follow/', author=another_user, group=group
+        )